@@ -1,12 +1,24 @@
 #!/usr/bin/env python3
 
 import os
+import sys
 import json
+import signal
+import sqlite3
 import logging
+import argparse
+import csv
+import math
+import operator
+import threading
+from bisect import bisect_left, insort
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
+from itertools import islice
 from platform import python_version_tuple
 from getpass import getpass
-from time import time
+from time import time, sleep
 from pwd import getpwall
 import requests
 
@@ -110,6 +122,12 @@ if not CONF:
 
 class Netatmo(object):
 
+    # Netatmo allows 50 requests every 10 seconds per user: shared by all instances
+    _RATE_LIMIT = 50
+    _RATE_PERIOD = 10
+    __rate_lock = threading.Lock()
+    __rate_calls = deque()
+
     def __init__(self, log_level):
         logging.basicConfig(format='[*] %(levelname)s : %(module)s : %(message)s', level=getattr(logging, log_level))
         self.__BASE_URL = 'https://api.netatmo.com'
@@ -138,10 +156,27 @@ class Netatmo(object):
             string += k + '  ::  ' + str(self.__dict__[k]) + '\n'
         return string
 
-    def _api_call(self, resource, payload):
+    def _wait_rate_limit(self):
+        with Netatmo.__rate_lock:
+            now = time()
+            while Netatmo.__rate_calls and now - Netatmo.__rate_calls[0] >= self._RATE_PERIOD:
+                Netatmo.__rate_calls.popleft()
+            if len(Netatmo.__rate_calls) >= self._RATE_LIMIT:
+                delay = self._RATE_PERIOD - (now - Netatmo.__rate_calls.popleft())
+                logger.debug('Rate limit reached: waiting %.1f seconds', delay)
+                sleep(delay)
+                now = time()
+            Netatmo.__rate_calls.append(now)
+
+    def _api_call(self, resource, payload, json_body=False):
         logger.debug('API call : %s : %s', resource, payload)
+        self._wait_rate_limit()
         try:
-            response = requests.post(self.__BASE_URL + resource, data=payload)
+            if json_body:
+                headers = {'Authorization': 'Bearer ' + self.access_token}
+                response = requests.post(self.__BASE_URL + resource, json=payload, headers=headers)
+            else:
+                response = requests.post(self.__BASE_URL + resource, data=payload)
             response.raise_for_status()
             try:
                 return response.json()
@@ -322,6 +357,161 @@ class Thermostat(Netatmo):
 
 
 
+################
+#  ENERGY API  #
+################
+
+
+class Energy(Netatmo):
+
+    def __init__(self, home_id=None, log_level='WARNING'):
+        Netatmo.__init__(self, log_level)
+        self.__class_scope = ['read_thermostat', 'write_thermostat']
+        for scope in self.__class_scope:
+            if scope not in self.scope:
+                raise ScopeError(scope)
+        self.__home_id = home_id
+        self.__topology = None
+        self.__cache = None
+        self.__cache_timestamp = None
+        self.__CACHE_VALIDITY = 300     # seconds = 5 minutes
+        self.get_homes_data()
+        logger.debug('Energy.__init__ completed')
+
+    @property
+    def home_id(self):
+        return self.__home_id
+
+    @property
+    def topology(self):
+        return self.get_homes_data()
+
+    @property
+    def rooms(self):
+        status = dict((room['id'], room) for room in self.get_home_status().get('rooms', []))
+        rooms = list()
+        for room in self.topology.get('rooms', []):
+            merged = dict(room)
+            merged.update(status.get(room['id'], {}))
+            rooms.append(merged)
+        return rooms
+
+    def __str__(self):
+        string = '••Netatmo Energy Object••\n\n'
+        for k in self.__dict__:
+            string += k + '  ::  ' + str(self.__dict__[k]) + '\n'
+        return string
+
+    def get_homes_data(self, refresh=False):
+        if self.__topology and not refresh:
+            return self.__topology
+        logger.debug('Getting homes topology from the api...')
+        self._check_token_validity()
+        payload = {
+            'access_token': self.access_token
+        }
+        if self.home_id:
+            payload['home_id'] = self.home_id
+        homes = self._api_call('/api/homesdata', payload)['body']['homes']
+        homes = [h for h in homes if h['id'] == self.home_id or (not self.home_id and h.get('rooms'))]
+        if not homes:
+            raise APIError('No home with rooms found')
+        self.__topology = homes[0]
+        self.__home_id = homes[0]['id']
+        return self.__topology
+
+    def get_home_status(self):
+        logger.debug('Checking cache...')
+        if self.__cache and time() - self.__cache_timestamp < self.__CACHE_VALIDITY:
+            return self.__cache
+        logger.debug('Cache is invalid: getting home status from the api...')
+        self._check_token_validity()
+        payload = {
+            'access_token': self.access_token,
+            'home_id': self.home_id
+        }
+        data = self._api_call('/api/homestatus', payload)['body']['home']
+        self.__cache = data
+        self.__cache_timestamp = time()
+        return data
+
+    def get_room(self, room):
+        for r in self.rooms:
+            if room in (r['id'], r.get('name')):
+                return r
+        return None
+
+    def set_room_therm_points(self, setpoints, mode='manual', endtime=None):
+        logger.debug('Setting rooms thermal points...')
+        allowed_modes = ['manual', 'max', 'home']
+        if mode not in allowed_modes:
+            logger.error('Invalid choice for mode. Choose from ' + str(allowed_modes))
+            return False
+        self._check_token_validity()
+        rooms = list()
+        for room_id, temperature in setpoints.items():
+            room = {
+                'id': room_id,
+                'therm_setpoint_mode': mode
+            }
+            if mode == 'manual':
+                room['therm_setpoint_temperature'] = temperature
+            if endtime:
+                room['therm_setpoint_end_time'] = endtime
+            rooms.append(room)
+        # All rooms are set with a single request
+        payload = {
+            'home': {
+                'id': self.home_id,
+                'rooms': rooms
+            }
+        }
+        data = self._api_call('/api/setstate', payload, json_body=True)
+        self.__cache = None
+        return data
+
+    def set_room_therm_point(self, room_id, mode, temperature=None, endtime=None):
+        logger.debug('Setting room thermal point...')
+        allowed_modes = ['manual', 'max', 'home']
+        if mode not in allowed_modes:
+            logger.error('Invalid choice for mode. Choose from ' + str(allowed_modes))
+            return False
+        self._check_token_validity()
+        payload = {
+            'access_token': self.access_token,
+            'home_id': self.home_id,
+            'room_id': room_id,
+            'mode': mode
+        }
+        if temperature:
+            payload['temp'] = temperature
+        if endtime:
+            payload['endtime'] = endtime
+        data = self._api_call('/api/setroomthermpoint', payload)
+        self.__cache = None
+        return data
+
+    def set_therm_mode(self, mode, endtime=None):
+        logger.debug('Setting thermal mode...')
+        allowed_modes = ['schedule', 'away', 'hg']
+        if mode not in allowed_modes:
+            logger.error('Invalid choice for mode. Choose from ' + str(allowed_modes))
+            return False
+        self._check_token_validity()
+        payload = {
+            'access_token': self.access_token,
+            'home_id': self.home_id,
+            'mode': mode
+        }
+        if endtime:
+            payload['endtime'] = endtime
+        data = self._api_call('/api/setthermmode', payload)
+        self.__cache = None
+        return data
+
+
+
+
 #################
 #  WEATHER API  #
 #################
@@ -341,6 +531,18 @@ class Weather(Netatmo):
         self.__cache = None
         self.__cache_timestamp = None
         self.__CACHE_VALIDITY = 600     # seconds = 10 minutes
+        self.__UPLOAD_INTERVAL = 600    # stations upload every 10 minutes
+        self.__UPLOAD_DELAY = 30        # seconds to wait after the expected upload
+        self.__MIN_POLL_INTERVAL = 60   # guard between two polls
+        self.__GROUP_WINDOW = 60        # uploads expected this close together are fetched with a single poll
+        self.__LATE_RETRY = 60          # first retry for a reachable module whose upload is late
+        self.__MIN_BACKOFF = 600        # first retry for an unreachable module
+        self.__MAX_BACKOFF = 3600
+        self.__schedule = dict()        # module id -> (next poll timestamp, backoff, reachable)
+        self.__next_update = None
+        self.__derived = None
+        self.__derived_timestamp = None
+        self.__pressure_history = dict()    # module id -> list of (time_utc, pressure) over the last 3 hours
         logger.debug('Weather.__init__ completed')
 
     @property
@@ -360,6 +562,10 @@ class Weather(Netatmo):
     def device_id(self):
         return self.__device_id
 
+    @property
+    def next_update(self):
+        return self.__next_update
+
     def __str__(self):
         string = '••Netatmo Weather Object••\n\n'
         for k in self.__dict__:
@@ -369,7 +575,7 @@ class Weather(Netatmo):
 
     def get_stations_data(self):
         logger.debug('Checking cache...')
-        if self.__cache and time() - self.__cache_timestamp < self.__CACHE_VALIDITY:
+        if self.__cache and time() < self.__next_update:
             return self.__cache
         logger.debug('Cache is invalid: getting stations data from the api...')
         self._check_token_validity()
@@ -382,8 +588,188 @@ class Weather(Netatmo):
         data = self._api_call('/api/getstationsdata', payload)
         self.__cache = data
         self.__cache_timestamp = time()
+        self._schedule_next_update(data)
         return data
 
+    def _schedule_next_update(self, data):
+        logger.debug('Scheduling next update...')
+        now = time()
+        schedule = dict()
+        for device in data['body']['devices']:
+            for module in [device] + device.get('modules', []):
+                last_upload = module.get('dashboard_data', {}).get('time_utc')
+                reachable = bool(last_upload) and module.get('reachable', True)
+                if reachable and last_upload + self.__UPLOAD_INTERVAL + self.__UPLOAD_DELAY > now:
+                    schedule[module['_id']] = (last_upload + self.__UPLOAD_INTERVAL + self.__UPLOAD_DELAY, None, True)
+                    continue
+                # Late modules are retried shortly, unreachable ones back off up to an hour
+                previous = self.__schedule.get(module['_id'])
+                if previous and previous[1] and previous[2] == reachable and previous[0] > now:
+                    schedule[module['_id']] = previous
+                    continue
+                if reachable:
+                    first, last = self.__LATE_RETRY, self.__UPLOAD_INTERVAL
+                else:
+                    first, last = self.__MIN_BACKOFF, self.__MAX_BACKOFF
+                if previous and previous[1] and previous[2] == reachable:
+                    backoff = min(previous[1] * 2, last)
+                else:
+                    backoff = first
+                logger.debug('Module %s is %s: retrying in %d seconds', module['_id'], 'late' if reachable else 'offline', backoff)
+                schedule[module['_id']] = (now + backoff, backoff, reachable)
+        self.__schedule = schedule
+        # Unreachable modules only drive the polling when no module is reachable
+        due = sorted(entry[0] for entry in schedule.values() if entry[2]) or sorted(entry[0] for entry in schedule.values())
+        if due:
+            next_update = max(d for d in due if d <= due[0] + self.__GROUP_WINDOW)
+            self.__next_update = max(next_update, now + self.__MIN_POLL_INTERVAL)
+        else:
+            self.__next_update = now + self.__CACHE_VALIDITY
+        logger.debug('Next update scheduled at %d', self.__next_update)
+
+    def get_derived_metrics(self):
+        import numpy as np
+        data = self.get_stations_data()
+        if self.__derived and self.__derived_timestamp == self.__cache_timestamp:
+            return self.__derived
+        logger.debug('Computing derived metrics...')
+        station_ids, module_ids, module_names = list(), list(), list()
+        columns = dict((k, list()) for k in ['Temperature', 'Humidity', 'Pressure', 'WindStrength', 'WindAngle', 'time_utc'])
+        for device in data['body']['devices']:
+            for module in [device] + device.get('modules', []):
+                dashboard_data = module.get('dashboard_data', {})
+                station_ids.append(device['_id'])
+                module_ids.append(module['_id'])
+                module_names.append(module.get('module_name', device['station_name']))
+                for k in columns:
+                    columns[k].append(dashboard_data.get(k, np.nan))
+        t, rh, p, ws, wa, ts = [np.array(columns[k], dtype=float) for k in ['Temperature', 'Humidity', 'Pressure', 'WindStrength', 'WindAngle', 'time_utc']]
+        # Pressure tendency is computed against the oldest reading in the last 3 hours
+        p0, ts0 = np.full(len(module_ids), np.nan), np.full(len(module_ids), np.nan)
+        for i, module_id in enumerate(module_ids):
+            history = self.__pressure_history.get(module_id, [])
+            if not np.isnan(p[i]) and (not history or history[-1][0] < ts[i]):
+                history = [h for h in history if ts[i] - h[0] <= 10800] + [(ts[i], p[i])]
+                self.__pressure_history[module_id] = history
+            if history:
+                ts0[i], p0[i] = history[0]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # Magnus formula
+            gamma = np.log(rh / 100) + 17.62 * t / (243.12 + t)
+            dew_point = 243.12 * gamma / (17.62 - gamma)
+            # Rothfusz regression (°F), only meaningful above 80°F
+            f = t * 9 / 5 + 32
+            hi = (-42.379 + 2.04901523 * f + 10.14333127 * rh - 0.22475541 * f * rh - 6.83783e-3 * f ** 2
+                  - 5.481717e-2 * rh ** 2 + 1.22874e-3 * f ** 2 * rh + 8.5282e-4 * f * rh ** 2 - 1.99e-6 * f ** 2 * rh ** 2)
+            heat_index = np.where(f >= 80, (hi - 32) * 5 / 9, t)
+            vapour_pressure = 6.11 * np.exp(5417.7530 * (1 / 273.16 - 1 / (273.15 + dew_point)))
+            humidex = t + 0.5555 * (vapour_pressure - 10)
+            pressure_tendency = np.where(ts > ts0, (p - p0) / (ts - ts0) * 10800, np.nan)
+            # Meteorological convention: the wind angle is where the wind blows from
+            wind_u = -ws * np.sin(np.radians(wa))
+            wind_v = -ws * np.cos(np.radians(wa))
+        self.__derived = {
+            'station_id': station_ids,
+            'module_id': module_ids,
+            'module_name': module_names,
+            'dew_point': dew_point,
+            'heat_index': heat_index,
+            'humidex': humidex,
+            'pressure_tendency': pressure_tendency,
+            'wind_u': wind_u,
+            'wind_v': wind_v
+        }
+        self.__derived_timestamp = self.__cache_timestamp
+        return self.__derived
+
+    def get_public_data(self, lat_ne, lon_ne, lat_sw, lon_sw, required_data=None, filter=False, tile_size=1.0, max_workers=4, cell_size=0.1):
+        logger.debug('Getting public data...')
+        self._check_token_validity()
+        tiles = list()
+        lat = lat_sw
+        while lat < lat_ne:
+            lon = lon_sw
+            while lon < lon_ne:
+                tiles.append((min(lat + tile_size, lat_ne), min(lon + tile_size, lon_ne), lat, lon))
+                lon += tile_size
+            lat += tile_size
+        logger.debug('Fetching %d tiles...', len(tiles))
+
+        def fetch(tile):
+            payload = {
+                'access_token': self.access_token,
+                'lat_ne': tile[0],
+                'lon_ne': tile[1],
+                'lat_sw': tile[2],
+                'lon_sw': tile[3],
+                'filter': str(filter).lower()
+            }
+            if required_data:
+                payload['required_data'] = required_data
+            return self._api_call('/api/getpublicdata', payload)['body']
+
+        stations = dict()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for body in executor.map(fetch, tiles):
+                for station in body:
+                    # Stations close to a tile border may be returned more than once
+                    stations[station['_id']] = station
+        return self.PublicStations(list(stations.values()), cell_size)
+
+    def iter_snapshot(self):
+        for device in self.get_stations_data()['body']['devices']:
+            for module in [device] + device.get('modules', []):
+                row = {
+                    'station_id': device['_id'],
+                    'station_name': device['station_name'],
+                    'module_id': module['_id'],
+                    'module_name': module.get('module_name', device['station_name'])
+                }
+                row.update(module.get('dashboard_data', {}))
+                yield row
+
+    def get_snapshot_fields(self):
+        fields = set(['station_id', 'station_name', 'module_id', 'module_name'])
+        for device in self.get_stations_data()['body']['devices']:
+            for module in [device] + device.get('modules', []):
+                fields.update(module.get('dashboard_data', {}))
+        return sorted(fields)
+
+    @staticmethod
+    def get_measure_fields(type='Temperature'):
+        return ['device_id', 'module_id', 'time'] + type.split(',')
+
+    def iter_measure(self, device_id, module_id=None, scale='max', type='Temperature', date_begin=None, date_end=None, limit=1024):
+        logger.debug('Getting measures...')
+        while True:
+            self._check_token_validity()
+            payload = {
+                'access_token': self.access_token,
+                'device_id': device_id,
+                'scale': scale,
+                'type': type,
+                'limit': limit,
+                'optimize': 'false',
+                'real_time': 'true'
+            }
+            if module_id:
+                payload['module_id'] = module_id
+            if date_begin:
+                payload['date_begin'] = date_begin
+            if date_end:
+                payload['date_end'] = date_end
+            body = self._api_call('/api/getmeasure', payload)['body']
+            if not body:
+                return
+            timestamps = sorted(body, key=int)
+            for timestamp in timestamps:
+                row = {'device_id': device_id, 'module_id': module_id, 'time': int(timestamp)}
+                row.update(zip(type.split(','), body[timestamp]))
+                yield row
+            if len(timestamps) < limit:
+                return
+            date_begin = int(timestamps[-1]) + 1
+
     def get_station_from_id(self, ID):
         for device in self.stations:
             if device.id == ID:
@@ -625,6 +1011,111 @@ class Weather(Netatmo):
             return False
 
 
+    class PublicStations(object):
+
+        def __init__(self, stations, cell_size=0.1):
+            self.__stations = stations
+            self.__cell_size = cell_size
+            self.__grid = dict()     # (row, col) -> list of stations
+            for station in stations:
+                lon, lat = station['place']['location']
+                self.__grid.setdefault(self._cell(lat, lon), list()).append(station)
+            logger.debug('PublicStations.__init__ completed')
+
+        @property
+        def stations(self):
+            return self.__stations
+
+        def __len__(self):
+            return len(self.__stations)
+
+        def __iter__(self):
+            return iter(self.__stations)
+
+        def __str__(self):
+            string = '••Netatmo Weather.PublicStations Object••\n\n'
+            for k in self.__dict__:
+                string += k + '  ::  ' + str(self.__dict__[k]) + '\n'
+            return string
+
+        def _cell(self, lat, lon):
+            return (int(math.floor(lat / self.__cell_size)), int(math.floor(lon / self.__cell_size)))
+
+        @staticmethod
+        def _distance(lat1, lon1, lat2, lon2):
+            # Equirectangular approximation, in km
+            x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+            y = math.radians(lat2 - lat1)
+            return 6371 * math.hypot(x, y)
+
+        @staticmethod
+        def get_value(station, metric):
+            for measure in station['measures'].values():
+                if metric in measure:
+                    return measure[metric]
+                if 'type' in measure and metric in measure['type']:
+                    latest = measure['res'][max(measure['res'], key=int)]
+                    return latest[measure['type'].index(metric)]
+            return None
+
+        def nearest(self, lat, lon, n=1):
+            if not self.__grid:
+                return list()
+            row, col = self._cell(lat, lon)
+            rows = [k[0] for k in self.__grid]
+            cols = [k[1] for k in self.__grid]
+            max_ring = max(abs(row - min(rows)), abs(row - max(rows)), abs(col - min(cols)), abs(col - max(cols)))
+            found = list()
+            for ring in range(max_ring + 1):
+                for r in range(row - ring, row + ring + 1):
+                    for c in range(col - ring, col + ring + 1):
+                        if max(abs(r - row), abs(c - col)) != ring:
+                            continue
+                        for station in self.__grid.get((r, c), []):
+                            s_lon, s_lat = station['place']['location']
+                            found.append((self._distance(lat, lon, s_lat, s_lon), station))
+                found.sort(key=lambda item: item[0])
+                # Anything outside the scanned rings is at least this far away
+                bound = self._distance(0, 0, ring * self.__cell_size, 0) * math.cos(math.radians(min(abs(lat) + (ring + 1) * self.__cell_size, 90)))
+                if len(found) >= n and found[n - 1][0] <= bound:
+                    break
+            return [station for distance, station in found[:n]]
+
+        def within(self, polygon):
+            # polygon is a list of (lat, lon) vertices
+            lats = [v[0] for v in polygon]
+            lons = [v[1] for v in polygon]
+            row_min, col_min = self._cell(min(lats), min(lons))
+            row_max, col_max = self._cell(max(lats), max(lons))
+            stations = list()
+            for r in range(row_min, row_max + 1):
+                for c in range(col_min, col_max + 1):
+                    for station in self.__grid.get((r, c), []):
+                        lon, lat = station['place']['location']
+                        if self._in_polygon(lat, lon, polygon):
+                            stations.append(station)
+            return stations
+
+        def mean(self, metric, polygon):
+            values = [self.get_value(station, metric) for station in self.within(polygon)]
+            values = [v for v in values if v is not None]
+            if not values:
+                return None
+            return sum(values) / len(values)
+
+        @staticmethod
+        def _in_polygon(lat, lon, polygon):
+            inside = False
+            j = len(polygon) - 1
+            for i in range(len(polygon)):
+                lat_i, lon_i = polygon[i]
+                lat_j, lon_j = polygon[j]
+                if (lat_i > lat) != (lat_j > lat) and lon < (lon_j - lon_i) * (lat - lat_i) / (lat_j - lat_i) + lon_i:
+                    inside = not inside
+                j = i
+            return inside
+
+
 
 
 ##################
@@ -675,6 +1166,90 @@ class Security(Netatmo):
                 string += k + '  ::  ' + str(self.__dict__[k]) + '\n'
             return string
 
+
+    class EventStore(object):
+
+        __INDEXED = ['camera_id', 'person_id', 'type']
+
+        def __init__(self, max_events=None, max_age=None):
+            self.max_events = max_events
+            self.max_age = max_age
+            self.__keys = list()        # (time, id) sorted by time
+            self.__events = dict()      # id -> Event
+            self.__indexes = dict((attr, dict()) for attr in self.__INDEXED)    # attr -> value -> sorted (time, id)
+
+        def __len__(self):
+            return len(self.__keys)
+
+        def __contains__(self, event):
+            return event.id in self.__events
+
+        def __str__(self):
+            string = '••Netatmo Security.EventStore Object••\n\n'
+            for k in self.__dict__:
+                string += k + '  ::  ' + str(self.__dict__[k]) + '\n'
+            return string
+
+        def add(self, events):
+            added = 0
+            for event in events:
+                if event.id in self.__events:
+                    continue
+                key = (event.time, event.id)
+                self.__events[event.id] = event
+                insort(self.__keys, key)
+                for attr, index in self.__indexes.items():
+                    value = getattr(event, attr, None)
+                    if value is not None:
+                        insort(index.setdefault(value, list()), key)
+                added += 1
+            self._evict()
+            return added
+
+        def _evict(self):
+            count = 0
+            if self.max_events is not None and len(self.__keys) > self.max_events:
+                count = len(self.__keys) - self.max_events
+            if self.max_age is not None:
+                count = max(count, bisect_left(self.__keys, (time() - self.max_age,)))
+            if not count:
+                return
+            logger.debug('Evicting %d events...', count)
+            evicted = self.__keys[:count]
+            del self.__keys[:count]
+            # Evicted events are the oldest ones, so they are at the head of every index
+            heads = dict((attr, dict()) for attr in self.__indexes)
+            for key in evicted:
+                event = self.__events.pop(key[1])
+                for attr in self.__indexes:
+                    value = getattr(event, attr, None)
+                    if value is not None:
+                        heads[attr][value] = heads[attr].get(value, 0) + 1
+            for attr, values in heads.items():
+                index = self.__indexes[attr]
+                for value, n in values.items():
+                    del index[value][:n]
+                    if not index[value]:
+                        del index[value]
+
+        def query(self, start=None, end=None, camera_id=None, person_id=None, type=None, limit=None):
+            self._evict()
+            filters = dict((attr, value) for attr, value in zip(self.__INDEXED, [camera_id, person_id, type]) if value is not None)
+            keys = self.__keys
+            if filters:
+                # Scan the most selective index and check the other filters on its events
+                keys = min((self.__indexes[attr].get(value, []) for attr, value in filters.items()), key=len)
+            lo = bisect_left(keys, (start,)) if start is not None else 0
+            hi = bisect_left(keys, (end,)) if end is not None else len(keys)
+            events = list()
+            for key in keys[lo:hi]:
+                event = self.__events[key[1]]
+                if all(getattr(event, attr, None) == value for attr, value in filters.items()):
+                    events.append(event)
+                    if limit and len(events) >= limit:
+                        break
+            return events
+
     @property
     def cameras(self):
         return self.get_cameras()
@@ -687,7 +1262,7 @@ class Security(Netatmo):
     def persons(self):
         return self.get_persons()
 
-    def __init__(self, name, log_level='WARNING'):
+    def __init__(self, name, log_level='WARNING', max_events=10000, max_age=None):
         from PIL import Image
         Netatmo.__init__(self, log_level)
         self.__class_scope = ['read_camera', 'access_camera', 'write_camera']
@@ -696,6 +1271,11 @@ class Security(Netatmo):
                 raise ScopeError(scope)
         self.name = name
         self.home_id, self.place = self._get_home_info()
+        self.__camera_urls = dict()     # camera id -> (url, is local, timestamp)
+        self.__CAMERA_URL_VALIDITY = 300    # seconds = 5 minutes
+        self.__LOCAL_TIMEOUT = 2            # seconds
+        self.__CLOUD_TIMEOUT = 10           # seconds
+        self.event_store = self.EventStore(max_events, max_age)
 
     def __str__(self):
         string = '••Netatmo Security Object••\n\n'
@@ -718,6 +1298,7 @@ class Security(Netatmo):
             'size': size
         }
         try:
+            self._wait_rate_limit()
             response = requests.post('https://api.netatmo.com/api/gethomedata', params=params)
             response.raise_for_status()
             data = response.json()['body']['homes']
@@ -734,7 +1315,41 @@ class Security(Netatmo):
         return [self.Camera(c) for c in self.get_home_data()['cameras']]
 
     def get_events(self, numbers_of_events=15):
-        return [self.Event(e) for e in self.get_home_data(numbers_of_events)['events']]
+        events = [self.Event(e) for e in self.get_home_data(numbers_of_events)['events']]
+        self.event_store.add(events)
+        return events
+
+    def iter_events(self, size=30, until=None):
+        # Pages through the history, newest first, without keeping it in memory
+        events = self.get_home_data(size)['events']
+        while events:
+            for e in events:
+                if until is not None and e['time'] < until:
+                    return
+                yield self.Event(e)
+            events = self._get_next_events(events[-1]['id'], size)
+
+    def _get_next_events(self, event_id, size):
+        logger.debug('Getting next events...')
+        self._check_token_validity()
+        params = {
+            'access_token': self.access_token,
+            'home_id': self.home_id,
+            'event_id': event_id,
+            'size': size
+        }
+        try:
+            self._wait_rate_limit()
+            response = requests.post('https://api.netatmo.com/api/getnextevents', params=params)
+            response.raise_for_status()
+            data = response.json()['body']['events_list']
+            response.connection.close()
+            return data
+        except requests.exceptions.HTTPError as error:
+            raise APIError(error.response.text)
+
+    def query_events(self, start=None, end=None, camera_id=None, person_id=None, type=None, limit=None):
+        return self.event_store.query(start, end, camera_id, person_id, type, limit)
 
     def get_persons(self, name=None, pseudo=False):
         #if type(pseudo) != bool:
@@ -757,6 +1372,7 @@ class Security(Netatmo):
         #if type(event) not in [Security.Event, Security.Person]:
         if not isinstance(event, (Security.Event, Security.Person)):
             raise TypeError('The input must be an event or a person object')
+        from PIL import Image
         logger.debug('Getting event related image...')
         try:
             self._check_token_validity()
@@ -765,6 +1381,7 @@ class Security(Netatmo):
                 url = base_url + 'image_id=' + str(event.snapshot['id']) + '&key=' + str(event.snapshot['key'])
             except AttributeError:
                 url = base_url + 'image_id=' + str(event.face['id']) + '&key=' + str(event.face['key'])
+            self._wait_rate_limit()
             response = requests.get(url)
             response.raise_for_status()
             img = Image.open(BytesIO(response.content))
@@ -776,6 +1393,73 @@ class Security(Netatmo):
         except requests.exceptions.HTTPError as error:
             raise APIError(error.response.text)
 
+    def get_camera_url(self, camera):
+        if not isinstance(camera, Security.Camera):
+            raise TypeError('The input must be a Security.Camera object')
+        if not getattr(camera, 'vpn_url', None):
+            raise APIError('Camera ' + str(camera.id) + ' is not connected: it has no URL')
+        # A camera that reconnects gets a new vpn_url, which must be resolved again
+        cached = self.__camera_urls.get((camera.id, camera.vpn_url))
+        if cached and time() - cached[2] < self.__CAMERA_URL_VALIDITY:
+            return cached[0], cached[1]
+        logger.debug('Looking for camera on the local network...')
+        url, local = camera.vpn_url, False
+        if getattr(camera, 'is_local', False):
+            try:
+                response = requests.get(camera.vpn_url + '/command/ping', timeout=self.__CLOUD_TIMEOUT)
+                local_url = response.json()['local_url']
+                response.connection.close()
+                # The camera is reachable on the LAN only if it answers on its local URL
+                response = requests.get(local_url + '/command/ping', timeout=self.__LOCAL_TIMEOUT)
+                if response.json()['local_url'] == local_url:
+                    url, local = local_url, True
+                response.connection.close()
+            except (requests.exceptions.RequestException, ValueError, KeyError):
+                logger.debug('Camera is not reachable locally: using the cloud')
+        self.__camera_urls = dict((k, v) for k, v in self.__camera_urls.items() if k[0] != camera.id)
+        self.__camera_urls[(camera.id, camera.vpn_url)] = (url, local, time())
+        return url, local
+
+    def get_camera_status(self, camera):
+        url, local = self.get_camera_url(camera)
+        logger.debug('Getting camera status...')
+        try:
+            response = requests.get(url + '/command/ping', timeout=self.__LOCAL_TIMEOUT if local else self.__CLOUD_TIMEOUT)
+            response.raise_for_status()
+            data = response.json()
+            response.connection.close()
+            data['is_local'] = local
+            return data
+        except (requests.exceptions.RequestException, ValueError) as error:
+            return self._camera_fallback(camera, local, error, self.get_camera_status, camera)
+
+    def get_live_snapshot(self, camera, show=False):
+        from PIL import Image
+        url, local = self.get_camera_url(camera)
+        logger.debug('Getting live snapshot (%s)...', 'local' if local else 'cloud')
+        try:
+            response = requests.get(url + '/live/snapshot_720.jpg', timeout=self.__LOCAL_TIMEOUT if local else self.__CLOUD_TIMEOUT)
+            response.raise_for_status()
+            img = Image.open(BytesIO(response.content))
+            response.connection.close()
+            logger.debug('Request completed')
+        except (requests.exceptions.RequestException, OSError) as error:
+            # OSError: the body is not a valid image
+            return self._camera_fallback(camera, local, error, self.get_live_snapshot, camera, show)
+        if show:
+            img.show()
+        return img
+
+    def _camera_fallback(self, camera, local, error, method, *args):
+        if local:
+            # Fall back to the cloud if the camera left the local network
+            logger.debug('Local request failed (%s): using the cloud', error)
+            self.__camera_urls[(camera.id, camera.vpn_url)] = (camera.vpn_url, False, time())
+            return method(*args)
+        # Resolve the URL again on the next call
+        self.__camera_urls.pop((camera.id, camera.vpn_url), None)
+        raise APIError(str(error))
+
     def get_events_until(self, event):
         #if type(event) is not Security.Event:
         if not isinstance(event, Security.Event):
@@ -788,11 +1472,14 @@ class Security(Netatmo):
             'event_id': event.id
         }
         try:
+            self._wait_rate_limit()
             response = requests.post('https://api.netatmo.com/api/geteventsuntil', params=params)
             response.raise_for_status()
             data = response.json()['body']['events_list']
             response.connection.close()
-            return [self.Event(e) for e in data]
+            events = [self.Event(e) for e in data]
+            self.event_store.add(events)
+            return events
         except requests.exceptions.HTTPError as error:
             raise APIError(error.response.text)
 
@@ -809,6 +1496,7 @@ class Security(Netatmo):
             params['person_id'] = person.id
         logger.debug('Setting person status...')
         try:
+            self._wait_rate_limit()
             response = requests.post('https://api.netatmo.com/api/setpersonsaway', params=params)
             response.raise_for_status()
             data = response.text
@@ -826,6 +1514,7 @@ class Security(Netatmo):
         }
 
         try:
+            self._wait_rate_limit()
             response = requests.post('https://api.netatmo.com/api/addwebhook', params=params)
             response.raise_for_status()
             data = response.text
@@ -842,6 +1531,7 @@ class Security(Netatmo):
         }
 
         try:
+            self._wait_rate_limit()
             response = requests.post('https://api.netatmo.com/api/dropwebhook', params=params)
             response.raise_for_status()
             data = response.text
@@ -849,3 +1539,666 @@ class Security(Netatmo):
             print(data)
         except requests.exceptions.HTTPError as error:
             raise APIError(error.response.text)
+
+
+
+
+#################
+#  CHANGE DATA  #
+#################
+
+
+class Change(object):
+
+    def __init__(self, type, id, key=None, old=None, new=None, name=None):
+        self.type = type
+        self.id = id
+        self.key = key
+        self.old = old
+        self.new = new
+        self.name = name
+        self.time = time()
+
+    def __str__(self):
+        string = '••Netatmo Change Object••\n\n'
+        for k in self.__dict__:
+            string += k + '  ::  ' + str(self.__dict__[k]) + '\n'
+        return string
+
+
+class Differ(object):
+
+    # Timestamps, URLs and radio/wifi signal levels change on every refresh without any actual change
+    _VOLATILE_KEYS = frozenset([
+        'time_utc', 'time', 'last_seen', 'last_message', 'last_setup', 'last_status_store',
+        'last_plug_seen', 'last_therm_seen', 'vpn_url', 'rf_status', 'wifi_status'
+    ])
+
+    def __init__(self):
+        self.__state = None
+        self.__subscribers = list()
+
+    @property
+    def state(self):
+        return self.__state
+
+    def __str__(self):
+        string = '••Netatmo Differ Object••\n\n'
+        for k in self.__dict__:
+            string += k + '  ::  ' + str(self.__dict__[k]) + '\n'
+        return string
+
+    def subscribe(self, callback):
+        self.__subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self.__subscribers.remove(callback)
+
+    def reset(self):
+        self.__state = None
+
+    def update(self, snapshot):
+        logger.debug('Diffing snapshot...')
+        state = self._flatten(snapshot)
+        changes = self._diff(self.__state or dict(), state)
+        self.__state = state
+        if changes:
+            for callback in self.__subscribers:
+                callback(changes)
+        return changes
+
+    @staticmethod
+    def _flatten(snapshot):
+        # Map every entity in the snapshot to (kind, name, flat dict of watched values)
+        entities = dict()
+        if 'body' in snapshot:
+            snapshot = snapshot['body']
+        if 'homes' in snapshot:
+            for home in snapshot['homes']:
+                entities.update(Differ._flatten(home))
+            return entities
+        for device in snapshot.get('devices', []):
+            for module in [device] + device.get('modules', []):
+                values = dict()
+                for k, v in module.items():
+                    if k in ('dashboard_data', 'measured'):
+                        values.update(v)
+                    elif not isinstance(v, (dict, list)):
+                        values[k] = v
+                values.pop('_id', None)
+                name = module.get('module_name', module.get('station_name'))
+                entities[module['_id']] = ('module', name, values)
+        for camera in snapshot.get('cameras', []):
+            values = dict((k, v) for k, v in camera.items() if not isinstance(v, (dict, list)))
+            entities[camera['id']] = ('camera', camera.get('name'), values)
+        for person in snapshot.get('persons', []):
+            values = dict((k, v) for k, v in person.items() if not isinstance(v, (dict, list)))
+            entities[person['id']] = ('person', person.get('pseudo'), values)
+        for event in snapshot.get('events', []):
+            entities[event['id']] = ('event', event.get('type'), dict(event))
+        return entities
+
+    @staticmethod
+    def _diff(old_state, new_state):
+        changes = list()
+        for id, (kind, name, values) in new_state.items():
+            if id not in old_state:
+                changes.append(Change('event' if kind == 'event' else 'added', id, new=values, name=name))
+                continue
+            if kind == 'event':
+                continue
+            old_values = old_state[id][2]
+            for key in set(old_values) | set(values):
+                old, new = old_values.get(key), values.get(key)
+                if old == new or key in Differ._VOLATILE_KEYS:
+                    continue
+                if key == 'reachable' or (kind == 'camera' and key == 'status'):
+                    type = 'online' if new in (True, 'on') else 'offline'
+                elif key == 'therm_relay_cmd':
+                    type = 'relay'
+                elif kind == 'person' and key == 'out_of_sight':
+                    type = 'left' if new else 'arrived'
+                else:
+                    type = 'metric'
+                changes.append(Change(type, id, key, old, new, name))
+        for id, (kind, name, values) in old_state.items():
+            if id not in new_state and kind != 'event':
+                changes.append(Change('removed', id, old=values, name=name))
+        return changes
+
+
+
+
+
+#################
+#  RULE ENGINE  #
+#################
+
+
+class Rule(object):
+
+    __OPERATORS = {
+        '>': operator.gt,
+        '>=': operator.ge,
+        '<': operator.lt,
+        '<=': operator.le,
+        '==': operator.eq,
+        '!=': operator.ne
+    }
+
+    def __init__(self, name, key, op, threshold, id=None, duration=0):
+        if op not in self.__OPERATORS:
+            raise ValueError('Invalid operator. Choose from ' + str(list(self.__OPERATORS)))
+        self.name = name
+        self.key = key
+        self.op = op
+        self.threshold = threshold
+        self.id = id
+        self.duration = duration
+        self.__compare = self.__OPERATORS[op]
+
+    def __str__(self):
+        string = '••Netatmo Rule Object••\n\n'
+        for k in self.__dict__:
+            string += k + '  ::  ' + str(self.__dict__[k]) + '\n'
+        return string
+
+    def matches(self, value):
+        try:
+            return value is not None and self.__compare(value, self.threshold)
+        except TypeError:
+            return False
+
+
+class Alert(object):
+
+    def __init__(self, rule, id, name, value, active):
+        self.rule = rule
+        self.id = id
+        self.name = name
+        self.value = value
+        self.active = active
+        self.time = time()
+
+    def __str__(self):
+        string = '••Netatmo Alert Object••\n\n'
+        for k in self.__dict__:
+            string += k + '  ::  ' + str(self.__dict__[k]) + '\n'
+        return string
+
+
+class RuleEngine(object):
+
+    def __init__(self):
+        self.__rules = dict()       # rule name -> Rule
+        self.__index = dict()       # (key, id or None) -> list of rules
+        self.__pending = dict()     # (rule name, id) -> (since, name, value), for rules with a duration
+        self.__active = dict()      # (rule name, id) -> Alert
+        self.__subscribers = list()
+
+    @property
+    def rules(self):
+        return list(self.__rules.values())
+
+    @property
+    def active_alerts(self):
+        return list(self.__active.values())
+
+    def __str__(self):
+        string = '••Netatmo RuleEngine Object••\n\n'
+        for k in self.__dict__:
+            string += k + '  ::  ' + str(self.__dict__[k]) + '\n'
+        return string
+
+    def subscribe(self, callback):
+        self.__subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self.__subscribers.remove(callback)
+
+    def add_rule(self, name, key, op, threshold, id=None, duration=0):
+        if name in self.__rules:
+            self.remove_rule(name)
+        rule = Rule(name, key, op, threshold, id, duration)
+        self.__rules[name] = rule
+        self.__index.setdefault((key, id), list()).append(rule)
+        return rule
+
+    def remove_rule(self, name):
+        rule = self.__rules.pop(name)
+        self.__index[(rule.key, rule.id)].remove(rule)
+        if not self.__index[(rule.key, rule.id)]:
+            del self.__index[(rule.key, rule.id)]
+        for state in (self.__pending, self.__active):
+            for k in [k for k in state if k[0] == name]:
+                del state[k]
+
+    def process(self, changes):
+        logger.debug('Evaluating rules on %d changes...', len(changes))
+        alerts = list()
+        for change in changes:
+            if change.type == 'added':
+                for key, value in change.new.items():
+                    self._evaluate(change.id, change.name, key, value, alerts)
+            elif change.type == 'removed':
+                for key, value in change.old.items():
+                    self._evaluate(change.id, change.name, key, None, alerts)
+            elif change.key is not None:
+                self._evaluate(change.id, change.name, change.key, change.new, alerts)
+        return self._notify(alerts)
+
+    def check(self, now=None):
+        # Only rules waiting for their duration to elapse need a time-based check
+        now = now or time()
+        alerts = list()
+        for k, (since, name, value) in list(self.__pending.items()):
+            if now - since >= self.__rules[k[0]].duration:
+                del self.__pending[k]
+                self.__active[k] = Alert(self.__rules[k[0]], k[1], name, value, True)
+                alerts.append(self.__active[k])
+        return self._notify(alerts)
+
+    def _evaluate(self, id, name, key, value, alerts):
+        for rule in self.__index.get((key, id), []) + self.__index.get((key, None), []):
+            k = (rule.name, id)
+            if rule.matches(value):
+                if k in self.__active:
+                    continue
+                if rule.duration:
+                    if k not in self.__pending:
+                        self.__pending[k] = (time(), name, value)
+                    continue
+                self.__active[k] = Alert(rule, id, name, value, True)
+                alerts.append(self.__active[k])
+            else:
+                self.__pending.pop(k, None)
+                if k in self.__active:
+                    del self.__active[k]
+                    alerts.append(Alert(rule, id, name, value, False))
+
+    def _notify(self, alerts):
+        if alerts:
+            for callback in self.__subscribers:
+                callback(alerts)
+        return alerts
+
+
+
+
+
+###############
+#  EXPORTERS  #
+###############
+
+
+class _Exporter(object):
+
+    def __init__(self, path, fields=None, chunk_size=10000, ignore_extra=False):
+        self.path = path
+        self.fields = fields
+        self.chunk_size = chunk_size
+        self.ignore_extra = ignore_extra
+        self.rows = 0
+        self.__dropped = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __str__(self):
+        string = '••Netatmo ' + type(self).__name__ + ' Object••\n\n'
+        for k in self.__dict__:
+            string += k + '  ::  ' + str(self.__dict__[k]) + '\n'
+        return string
+
+    @staticmethod
+    def _row(row):
+        # Accept both raw dicts and Security objects, flattening nested values to JSON
+        if not isinstance(row, dict):
+            row = vars(row)
+        return dict((k, json.dumps(v) if isinstance(v, (dict, list)) else v) for k, v in row.items())
+
+    def write(self, rows):
+        rows = iter(rows)
+        while True:
+            chunk = [self._row(row) for row in islice(rows, self.chunk_size)]
+            if not chunk:
+                return self.rows
+            if self.fields is None:
+                self.fields = sorted(set(k for row in chunk for k in row))
+            self._check_fields(chunk)
+            self._write_chunk(chunk)
+            self.rows += len(chunk)
+            logger.debug('%s : %d rows written', self.path, self.rows)
+
+    def _check_fields(self, chunk):
+        # Columns are fixed once the file is started: never drop new keys silently
+        extra = set(k for row in chunk for k in row).difference(self.fields)
+        if not extra:
+            return
+        if not self.ignore_extra:
+            raise ValueError('Rows have keys that are not in the exported fields: ' + str(sorted(extra)) +
+                             '. Pass all the fields to the exporter or set ignore_extra=True')
+        if extra - self.__dropped:
+            logger.warning('%s : dropping keys not in the exported fields: %s', self.path, sorted(extra - self.__dropped))
+            self.__dropped.update(extra)
+
+    def _write_chunk(self, chunk):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class CSVExporter(_Exporter):
+
+    def __init__(self, path, fields=None, chunk_size=10000, ignore_extra=False):
+        _Exporter.__init__(self, path, fields, chunk_size, ignore_extra)
+        self.__file = open(path, 'w', newline='')
+        self.__writer = None
+
+    def _write_chunk(self, chunk):
+        if not self.__writer:
+            self.__writer = csv.DictWriter(self.__file, self.fields, extrasaction='ignore')
+            self.__writer.writeheader()
+        self.__writer.writerows(chunk)
+
+    def close(self):
+        self.__file.close()
+
+
+class ArrowExporter(_Exporter):
+
+    def __init__(self, path, fields=None, chunk_size=10000, ignore_extra=False, schema=None):
+        import pyarrow
+        _Exporter.__init__(self, path, fields or (schema.names if schema else None), chunk_size, ignore_extra)
+        self._pa = pyarrow
+        self.schema = schema
+        self._writer = None
+
+    def _table(self, chunk):
+        pa = self._pa
+        columns = dict((f, [row.get(f) for row in chunk]) for f in self.fields)
+        if self.schema is None:
+            # Measures can be ints in one chunk and floats in the next: widen numbers to float64.
+            # Columns without any value yet (e.g. offline modules) are assumed to be numeric.
+            fields = list()
+            for field in pa.Table.from_pydict(columns).schema:
+                if pa.types.is_null(field.type) or pa.types.is_integer(field.type):
+                    field = field.with_type(pa.float64())
+                fields.append(field)
+            self.schema = pa.schema(fields)
+        for field in self.schema:
+            columns[field.name] = [self._cast(field, v) for v in columns[field.name]]
+        return pa.Table.from_pydict(columns, schema=self.schema)
+
+    def _cast(self, field, value):
+        # Cast explicitly so that a mismatching value fails with a clear error, not halfway through pyarrow
+        pa = self._pa
+        if value is None:
+            return None
+        try:
+            if pa.types.is_floating(field.type):
+                return float(value)
+            elif pa.types.is_integer(field.type):
+                return int(value)
+            elif pa.types.is_boolean(field.type):
+                return bool(value)
+            elif pa.types.is_string(field.type):
+                return value if isinstance(value, str) else json.dumps(value)
+        except (TypeError, ValueError):
+            raise ValueError('Value ' + repr(value) + ' of field \'' + field.name + '\' does not match the schema type ' + str(field.type) +
+                             '. Pass a schema to the exporter')
+        return value
+
+    def _open_writer(self):
+        return self._pa.ipc.new_file(self.path, self.schema)
+
+    def _write_chunk(self, chunk):
+        table = self._table(chunk)
+        if not self._writer:
+            self._writer = self._open_writer()
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer:
+            self._writer.close()
+
+
+class ParquetExporter(ArrowExporter):
+
+    def _open_writer(self):
+        import pyarrow.parquet
+        return pyarrow.parquet.ParquetWriter(self.path, self.schema)
+
+
+
+
+
+###############
+#  COLLECTOR  #
+###############
+
+
+class StdoutSink(object):
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+
+    def write(self, record):
+        with self.__lock:
+            sys.stdout.write(json.dumps(record, default=str) + '\n')
+            sys.stdout.flush()
+
+    def close(self):
+        pass
+
+
+class FileSink(object):
+
+    def __init__(self, path):
+        self.__lock = threading.Lock()
+        self.__file = open(path, 'a')
+
+    def write(self, record):
+        with self.__lock:
+            self.__file.write(json.dumps(record, default=str) + '\n')
+            self.__file.flush()
+
+    def close(self):
+        self.__file.close()
+
+
+class StoreSink(object):
+
+    def __init__(self, path):
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        self.__connection.execute('CREATE TABLE IF NOT EXISTS records (time REAL, device TEXT, type TEXT, data TEXT)')
+        self.__connection.execute('CREATE INDEX IF NOT EXISTS records_device_time ON records (device, time)')
+
+    def write(self, record):
+        with self.__lock:
+            self.__connection.execute('INSERT INTO records VALUES (?, ?, ?, ?)',
+                                      (record['time'], record['device'], record['type'], json.dumps(record['data'], default=str)))
+            self.__connection.commit()
+
+    def close(self):
+        self.__connection.close()
+
+
+class Collector(object):
+
+    __SINKS = {
+        'stdout': StdoutSink,
+        'file': FileSink,
+        'store': StoreSink
+    }
+
+    def __init__(self, config_path):
+        self.config_path = config_path
+        self.__clients = dict()     # (type, id) -> Weather/Thermostat/Security instance, kept across reloads
+        self.__client_configs = dict()  # (type, id) -> configuration the client was built with
+        self.__devices = list()
+        self.__sinks = list()
+        self.__next_poll = dict()
+        self.__running = set()
+        self.__lock = threading.Lock()
+        self.__reload = False
+        self.__stop = False
+        self.__stats = {'polls': 0, 'errors': 0, 'records': 0, 'start': time()}
+        self.load()
+
+    @property
+    def stats(self):
+        with self.__lock:
+            stats = dict(self.__stats)
+        stats['uptime'] = time() - stats.pop('start')
+        stats['polls_per_second'] = stats['polls'] / stats['uptime'] if stats['uptime'] else 0
+        return stats
+
+    def __str__(self):
+        string = '••Netatmo Collector Object••\n\n'
+        for k in self.__dict__:
+            string += k + '  ::  ' + str(self.__dict__[k]) + '\n'
+        return string
+
+    def load(self):
+        logger.info('Loading collector configuration from %s', self.config_path)
+        with open(self.config_path, 'r') as f:
+            config = json.load(f)
+        interval = config.get('interval', 600)
+        devices = list()
+        clients, client_configs = dict(), dict()
+        for device in config['devices']:
+            key = (device['type'], device.get('device_id') or device.get('name'))
+            # Keep the existing client (and its caches and tokens) unless its configuration changed
+            client_config = dict((k, v) for k, v in device.items() if k != 'interval')
+            if self.__client_configs.get(key) == client_config:
+                clients[key] = self.__clients[key]
+            else:
+                clients[key] = self._client(device)
+            client_configs[key] = client_config
+            devices.append((key, device.get('interval', interval)))
+        sinks = list()
+        for sink in config.get('sinks', [{'type': 'stdout'}]):
+            options = dict((k, v) for k, v in sink.items() if k != 'type')
+            sinks.append(self.__SINKS[sink['type']](**options))
+        for sink in self.__sinks:
+            sink.close()
+        self.__sinks = sinks
+        self.__clients = clients
+        self.__client_configs = client_configs
+        self.__devices = devices
+        self.interval = interval
+        self.workers = config.get('workers', 4)
+        self.stats_interval = config.get('stats_interval', 300)
+        self.__next_poll = dict((key, self.__next_poll.get(key, 0)) for key, interval in self.__devices)
+
+    @staticmethod
+    def _client(device):
+        if device['type'] == 'weather':
+            return Weather(device.get('device_id'), device.get('get_favorites', False))
+        elif device['type'] == 'thermostat':
+            return Thermostat(device['device_id'])
+        elif device['type'] == 'security':
+            return Security(device['name'])
+        raise ValueError('Invalid device type. Choose from [\'weather\', \'thermostat\', \'security\']')
+
+    def _poll(self, key, interval):
+        type, id = key
+        client = self.__clients[key]
+        next_poll = time() + interval
+        try:
+            if type == 'weather':
+                data = client.get_stations_data()['body']
+                next_poll = client.next_update
+            elif type == 'thermostat':
+                data = client.get_thermostats_data()
+            else:
+                data = client.get_home_data()
+            record = {'time': time(), 'device': id, 'type': type, 'data': data}
+            for sink in self.__sinks:
+                sink.write(record)
+            with self.__lock:
+                self.__stats['records'] += 1
+        except (NetatmoError, requests.exceptions.RequestException) as error:
+            logger.error('Polling %s %s failed: %s', type, id, error)
+            with self.__lock:
+                self.__stats['errors'] += 1
+        except Exception:
+            logger.exception('Unexpected error while polling %s %s', type, id)
+            with self.__lock:
+                self.__stats['errors'] += 1
+        finally:
+            # Always release the device, otherwise it would never be polled again and reloads would hang
+            with self.__lock:
+                self.__stats['polls'] += 1
+                self.__next_poll[key] = next_poll
+                self.__running.discard(key)
+
+    def reload(self, *args):
+        self.__reload = True
+
+    def stop(self, *args):
+        self.__stop = True
+
+    def run(self, once=False):
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, self.reload)
+        last_stats = time()
+        workers = self.workers
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            while not self.__stop:
+                # Reload only once in-flight polls are done, so that no sink is closed while in use
+                if self.__reload and not self.__running:
+                    self.__reload = False
+                    try:
+                        self.load()
+                    except (IOError, ValueError, KeyError, NetatmoError) as error:
+                        logger.error('Reload failed, keeping the current configuration: %s', error)
+                    if self.workers != workers:
+                        logger.info('Resizing the worker pool from %d to %d', workers, self.workers)
+                        executor.shutdown(wait=True)
+                        workers = self.workers
+                        executor = ThreadPoolExecutor(max_workers=workers)
+                now = time()
+                with self.__lock:
+                    due = list()
+                    if not self.__reload:
+                        due = [(key, interval) for key, interval in self.__devices
+                               if key not in self.__running and self.__next_poll.get(key, 0) <= now]
+                    self.__running.update(key for key, interval in due)
+                futures = [executor.submit(self._poll, key, interval) for key, interval in due]
+                if once:
+                    for future in futures:
+                        future.result()
+                    break
+                if now - last_stats >= self.stats_interval:
+                    logger.info('Collector stats: %s', self.stats)
+                    last_stats = now
+                sleep(1)
+        finally:
+            executor.shutdown(wait=True)
+        for sink in self.__sinks:
+            sink.close()
+        logger.info('Collector stopped: %s', self.stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='pynetatmo', description='Netatmo data collector')
+    parser.add_argument('-c', '--config', required=True, help='collector configuration file (JSON)')
+    parser.add_argument('--once', action='store_true', help='poll every device once and exit')
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'])
+    args = parser.parse_args()
+    logger.setLevel(getattr(logging, args.log_level))
+    Collector(args.config).run(args.once)
+
+
+if __name__ == '__main__':
+    main()
@@ -28,5 +28,12 @@ setup(
 	],
 	keywords='netatmo, thermostat, weather, security, welcome',
 	py_modules=['netatmo'],
-	install_requires=['pillow', 'requests']
+	entry_points={
+		'console_scripts': ['pynetatmo=netatmo:main']
+	},
+	install_requires=['pillow', 'requests'],
+	extras_require={
+		'derived': ['numpy'],
+		'export': ['pyarrow']
+	}
 )
@@ -0,0 +1,81 @@
+import json
+import pwd
+import sys
+import threading
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+
+@pytest.fixture(scope='session')
+def netatmo(tmp_path_factory):
+    # netatmo loads ~/.pynetatmo.conf at import time: point it to a dummy one
+    home = tmp_path_factory.mktemp('home')
+    with open(str(home / '.pynetatmo.conf'), 'w') as f:
+        json.dump({'user': 'user', 'password': 'password', 'client_id': 'id', 'client_secret': 'secret', 'scope': 'read_camera'}, f)
+    entry = namedtuple('entry', 'pw_dir')
+    getpwall = pwd.getpwall
+    pwd.getpwall = lambda: [entry(str(home))]
+    try:
+        sys.modules.pop('netatmo', None)
+        import netatmo
+    finally:
+        pwd.getpwall = getpwall
+    return netatmo
+
+
+@pytest.fixture
+def offline_auth(netatmo, monkeypatch):
+    # Skip the OAuth call: grant every scope the classes check for
+    def _auth(self):
+        self._Netatmo__scope = ['read_station', 'read_thermostat', 'write_thermostat', 'read_camera', 'access_camera', 'write_camera']
+    monkeypatch.setattr(netatmo.Netatmo, '_auth', _auth)
+    monkeypatch.setattr(netatmo.Netatmo, '_check_token_validity', lambda self: None)
+
+
+class _CameraHandler(BaseHTTPRequestHandler):
+    # Answers like a Netatmo camera: /vpn/... stands for the cloud relay, /local/... for the LAN endpoint
+
+    def do_GET(self):
+        base = 'http://%s:%d' % self.server.server_address
+        path = self.path.split('/', 2)
+        if path[1] not in self.server.routes:
+            self.send_error(503)
+        elif path[2] == 'command/ping':
+            self._send('application/json', json.dumps({'local_url': base + '/local'}).encode())
+        elif path[2] == 'live/snapshot_720.jpg' and path[1] in self.server.broken:
+            self._send('image/jpeg', b'not an image')
+        elif path[2] == 'live/snapshot_720.jpg':
+            self.server.snapshots.append(path[1])
+            image = BytesIO()
+            Image.new('RGB', (4, 4), 'red').save(image, 'JPEG')
+            self._send('image/jpeg', image.getvalue())
+        else:
+            self.send_error(404)
+
+    def _send(self, content_type, body):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def camera_server():
+    server = HTTPServer(('127.0.0.1', 0), _CameraHandler)
+    server.routes = set(['vpn', 'vpn2', 'local'])
+    server.broken = set()
+    server.snapshots = list()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
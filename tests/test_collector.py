@@ -0,0 +1,82 @@
+import json
+
+
+class BrokenClient(object):
+
+    def get_thermostats_data(self):
+        raise KeyError('body')
+
+
+def test_poll_releases_device_on_unexpected_error(netatmo, tmp_path, monkeypatch):
+    config = tmp_path / 'collector.json'
+    with open(str(config), 'w') as f:
+        json.dump({'sinks': [{'type': 'file', 'path': str(tmp_path / 'out.jsonl')}],
+                   'devices': [{'type': 'thermostat', 'device_id': 'relay', 'interval': 60}]}, f)
+    monkeypatch.setattr(netatmo.Collector, '_client', staticmethod(lambda device: BrokenClient()))
+    collector = netatmo.Collector(str(config))
+    collector._Collector__running.add(('thermostat', 'relay'))
+    collector._poll(('thermostat', 'relay'), 60)
+    assert not collector._Collector__running
+    assert collector.stats['errors'] == 1
+    assert collector.stats['polls'] == 1
+
+
+class FakeClient(object):
+
+    def __init__(self, device):
+        self.device = device
+
+    def get_thermostats_data(self):
+        return {'devices': []}
+
+    def get_stations_data(self):
+        return {'body': {'devices': []}}
+
+    @property
+    def next_update(self):
+        return 0
+
+
+def write_config(path, devices, workers=4):
+    with open(str(path), 'w') as f:
+        json.dump({'workers': workers, 'sinks': [{'type': 'file', 'path': str(path) + '.jsonl'}], 'devices': devices}, f)
+
+
+def test_reload_rebuilds_changed_clients(netatmo, tmp_path, monkeypatch):
+    monkeypatch.setattr(netatmo.Collector, '_client', staticmethod(FakeClient))
+    config = tmp_path / 'collector.json'
+    write_config(config, [{'type': 'weather', 'device_id': 'station'},
+                          {'type': 'thermostat', 'device_id': 'relay'},
+                          {'type': 'thermostat', 'device_id': 'old'}])
+    collector = netatmo.Collector(str(config))
+    clients = dict(collector._Collector__clients)
+    write_config(config, [{'type': 'weather', 'device_id': 'station', 'get_favorites': True},
+                          {'type': 'thermostat', 'device_id': 'relay', 'interval': 60}])
+    collector.load()
+    reloaded = collector._Collector__clients
+    assert sorted(reloaded) == [('thermostat', 'relay'), ('weather', 'station')]
+    assert reloaded[('thermostat', 'relay')] is clients[('thermostat', 'relay')]
+    assert reloaded[('weather', 'station')] is not clients[('weather', 'station')]
+    assert reloaded[('weather', 'station')].device['get_favorites']
+
+
+def test_reload_resizes_worker_pool(netatmo, tmp_path, monkeypatch):
+    monkeypatch.setattr(netatmo.Collector, '_client', staticmethod(FakeClient))
+    monkeypatch.setattr(netatmo.signal, 'signal', lambda *args: None)
+    pools = list()
+    base = netatmo.ThreadPoolExecutor
+
+    class Executor(base):
+
+        def __init__(self, max_workers):
+            pools.append(max_workers)
+            base.__init__(self, max_workers)
+    monkeypatch.setattr(netatmo, 'ThreadPoolExecutor', Executor)
+    config = tmp_path / 'collector.json'
+    write_config(config, [{'type': 'thermostat', 'device_id': 'relay'}], workers=4)
+    collector = netatmo.Collector(str(config))
+    write_config(config, [{'type': 'thermostat', 'device_id': 'relay'}], workers=2)
+    collector.reload()
+    collector.run(once=True)
+    assert pools == [4, 2]
+    assert collector.stats['records'] == 1
@@ -0,0 +1,70 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+
+def snapshot(pressure=1013, time_utc=1000000):
+    return {'body': {'devices': [{
+        '_id': 'indoor',
+        'station_name': 'Home',
+        'dashboard_data': {'time_utc': time_utc, 'Temperature': 30.0, 'Humidity': 70, 'Pressure': pressure},
+        'modules': [{
+            '_id': 'wind',
+            'module_name': 'Wind',
+            'dashboard_data': {'time_utc': time_utc, 'WindStrength': 10, 'WindAngle': 90}
+        }]
+    }]}}
+
+
+@pytest.fixture
+def weather(netatmo, offline_auth, monkeypatch):
+    w = netatmo.Weather()
+    w.snapshot = snapshot()
+    w._Weather__cache_timestamp = 1
+
+    def get_stations_data():
+        return w.snapshot
+    monkeypatch.setattr(w, 'get_stations_data', get_stations_data)
+    return w
+
+
+def refresh(weather, data):
+    weather.snapshot = data
+    weather._Weather__cache_timestamp += 1
+
+
+def test_formulas(weather):
+    d = weather.get_derived_metrics()
+    assert d['module_id'] == ['indoor', 'wind']
+    assert d['station_id'] == ['indoor', 'indoor']
+    assert d['dew_point'][0] == pytest.approx(23.93, abs=0.01)
+    assert d['heat_index'][0] == pytest.approx(35.04, abs=0.01)
+    assert d['humidex'][0] == pytest.approx(41.20, abs=0.01)
+    assert d['wind_u'][1] == pytest.approx(-10)
+    assert d['wind_v'][1] == pytest.approx(0, abs=1e-9)
+
+
+def test_missing_measurements_are_nan(weather):
+    d = weather.get_derived_metrics()
+    for metric in ['dew_point', 'heat_index', 'humidex']:
+        assert np.isnan(d[metric][1])
+    for metric in ['wind_u', 'wind_v']:
+        assert np.isnan(d[metric][0])
+    # A single reading is not enough for a tendency
+    assert np.isnan(d['pressure_tendency']).all()
+
+
+def test_pressure_tendency(weather):
+    weather.get_derived_metrics()
+    refresh(weather, snapshot(pressure=1014, time_utc=1000000 + 3600))
+    d = weather.get_derived_metrics()
+    assert d['pressure_tendency'][0] == pytest.approx(3)
+    assert np.isnan(d['pressure_tendency'][1])
+
+
+def test_cached_until_refresh(weather):
+    first = weather.get_derived_metrics()
+    weather.snapshot = snapshot(pressure=1020, time_utc=1000000 + 600)
+    assert weather.get_derived_metrics() is first
+    weather._Weather__cache_timestamp += 1
+    assert weather.get_derived_metrics() is not first
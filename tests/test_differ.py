@@ -0,0 +1,52 @@
+import copy
+
+
+THERMOSTATS = {
+    'devices': [{
+        '_id': 'relay',
+        'station_name': 'Home',
+        'last_plug_seen': 1000,
+        'wifi_status': 60,
+        'modules': [{
+            '_id': 'thermostat',
+            'module_name': 'Living',
+            'last_therm_seen': 1000,
+            'rf_status': 70,
+            'therm_relay_cmd': 0,
+            'measured': {'time': 1000, 'temperature': 20.5, 'setpoint_temp': 21}
+        }]
+    }]
+}
+
+
+def refreshed(snapshot):
+    snapshot = copy.deepcopy(snapshot)
+    device = snapshot['devices'][0]
+    device['last_plug_seen'] += 600
+    device['wifi_status'] += 2
+    module = device['modules'][0]
+    module['last_therm_seen'] += 600
+    module['rf_status'] -= 3
+    module['measured']['time'] += 600
+    return snapshot
+
+
+def test_first_snapshot_reports_added(netatmo):
+    differ = netatmo.Differ()
+    assert sorted((c.type, c.id) for c in differ.update(THERMOSTATS)) == [('added', 'relay'), ('added', 'thermostat')]
+
+
+def test_unchanged_snapshot_is_silent(netatmo):
+    differ = netatmo.Differ()
+    differ.update(THERMOSTATS)
+    assert differ.update(refreshed(THERMOSTATS)) == []
+
+
+def test_relay_and_metric_changes(netatmo):
+    differ = netatmo.Differ()
+    differ.update(THERMOSTATS)
+    snapshot = refreshed(THERMOSTATS)
+    snapshot['devices'][0]['modules'][0]['therm_relay_cmd'] = 100
+    snapshot['devices'][0]['modules'][0]['measured']['temperature'] = 20.8
+    changes = sorted((c.type, c.key, c.new) for c in differ.update(snapshot))
+    assert changes == [('metric', 'temperature', 20.8), ('relay', 'therm_relay_cmd', 100)]
@@ -0,0 +1,85 @@
+import pytest
+
+
+HOMES = {'body': {'homes': [
+    {'id': 'empty', 'name': 'Cottage', 'rooms': []},
+    {'id': 'home', 'name': 'Home', 'rooms': [
+        {'id': '1', 'name': 'Living', 'module_ids': ['valve1']},
+        {'id': '2', 'name': 'Bedroom', 'module_ids': ['valve2']}
+    ]}
+]}}
+
+STATUS = {'body': {'home': {'id': 'home', 'rooms': [
+    {'id': '1', 'therm_measured_temperature': 20.5, 'therm_setpoint_temperature': 21, 'therm_setpoint_mode': 'schedule'},
+    {'id': '2', 'therm_measured_temperature': 18, 'therm_setpoint_temperature': 17, 'therm_setpoint_mode': 'schedule'}
+]}}}
+
+
+@pytest.fixture
+def calls(netatmo, offline_auth, monkeypatch):
+    calls = list()
+
+    def api_call(self, resource, payload, json_body=False):
+        calls.append((resource, payload, json_body))
+        if resource == '/api/homesdata':
+            return HOMES
+        if resource == '/api/homestatus':
+            return STATUS
+        return {'status': 'ok'}
+    monkeypatch.setattr(netatmo.Netatmo, '_api_call', api_call)
+    return calls
+
+
+def resources(calls):
+    return [c[0] for c in calls]
+
+
+def test_topology_is_loaded_once(netatmo, calls):
+    e = netatmo.Energy()
+    assert e.home_id == 'home'
+    e.topology
+    e.get_homes_data()
+    assert resources(calls) == ['/api/homesdata']
+
+
+def test_rooms_merge_topology_and_status(netatmo, calls):
+    e = netatmo.Energy()
+    assert e.rooms == [
+        {'id': '1', 'name': 'Living', 'module_ids': ['valve1'], 'therm_measured_temperature': 20.5,
+         'therm_setpoint_temperature': 21, 'therm_setpoint_mode': 'schedule'},
+        {'id': '2', 'name': 'Bedroom', 'module_ids': ['valve2'], 'therm_measured_temperature': 18,
+         'therm_setpoint_temperature': 17, 'therm_setpoint_mode': 'schedule'}
+    ]
+    assert e.get_room('Bedroom')['id'] == '2'
+    assert e.get_room('Kitchen') is None
+
+
+def test_status_is_cached_until_a_setter(netatmo, calls):
+    e = netatmo.Energy()
+    e.rooms
+    e.get_home_status()
+    assert resources(calls) == ['/api/homesdata', '/api/homestatus']
+    e.set_therm_mode('away')
+    e.rooms
+    assert resources(calls) == ['/api/homesdata', '/api/homestatus', '/api/setthermmode', '/api/homestatus']
+
+
+def test_set_room_therm_points_is_one_setstate_call(netatmo, calls):
+    e = netatmo.Energy()
+    del calls[:]
+    e.set_room_therm_points({'1': 22, '2': 19}, endtime=1500000000)
+    assert len(calls) == 1
+    resource, payload, json_body = calls[0]
+    assert resource == '/api/setstate'
+    assert json_body
+    assert payload == {'home': {'id': 'home', 'rooms': [
+        {'id': '1', 'therm_setpoint_mode': 'manual', 'therm_setpoint_temperature': 22, 'therm_setpoint_end_time': 1500000000},
+        {'id': '2', 'therm_setpoint_mode': 'manual', 'therm_setpoint_temperature': 19, 'therm_setpoint_end_time': 1500000000}
+    ]}}
+
+
+def test_invalid_mode(netatmo, calls):
+    e = netatmo.Energy()
+    del calls[:]
+    assert e.set_room_therm_points({'1': 22}, mode='boost') is False
+    assert calls == []
@@ -0,0 +1,36 @@
+from time import time
+
+
+def make_event(netatmo, i, **kwargs):
+    data = {'id': 'event%d' % i, 'time': 1000 + i, 'camera_id': 'camera%d' % (i % 2), 'type': 'movement'}
+    data.update(kwargs)
+    return netatmo.Security.Event(data)
+
+
+def test_add_and_query(netatmo):
+    store = netatmo.Security.EventStore()
+    events = [make_event(netatmo, i) for i in range(10)]
+    events.append(make_event(netatmo, 10, type='person', person_id='person0'))
+    assert store.add(reversed(events)) == 11
+    assert store.add(events[:3]) == 0
+    assert len(store) == 11
+    assert [e.id for e in store.query(start=1002, end=1005)] == ['event2', 'event3', 'event4']
+    assert [e.id for e in store.query(camera_id='camera1', end=1006)] == ['event1', 'event3', 'event5']
+    assert [e.id for e in store.query(person_id='person0')] == ['event10']
+    assert [e.id for e in store.query(type='movement', camera_id='camera0', limit=2)] == ['event0', 'event2']
+
+
+def test_evict_by_count(netatmo):
+    store = netatmo.Security.EventStore(max_events=4)
+    store.add([make_event(netatmo, i) for i in range(10)])
+    assert len(store) == 4
+    assert [e.id for e in store.query()] == ['event6', 'event7', 'event8', 'event9']
+    assert [e.id for e in store.query(camera_id='camera0')] == ['event6', 'event8']
+
+
+def test_evict_by_age(netatmo):
+    store = netatmo.Security.EventStore(max_age=60)
+    now = int(time())
+    store.add([make_event(netatmo, i, time=now - 90 + i * 20) for i in range(5)])
+    assert [e.id for e in store.query()] == ['event2', 'event3', 'event4']
+    assert [e.id for e in store.query(camera_id='camera1')] == ['event3']
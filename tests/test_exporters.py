@@ -0,0 +1,28 @@
+import csv
+
+import pytest
+
+
+def test_csv_rejects_keys_after_first_chunk(netatmo, tmp_path):
+    path = str(tmp_path / 'out.csv')
+    with netatmo.CSVExporter(path, chunk_size=1) as exporter:
+        with pytest.raises(ValueError):
+            exporter.write([{'Temperature': 21.5}, {'Temperature': 20, 'CO2': 800}])
+
+
+def test_csv_with_declared_fields(netatmo, tmp_path):
+    path = str(tmp_path / 'out.csv')
+    with netatmo.CSVExporter(path, fields=['CO2', 'Temperature'], chunk_size=1) as exporter:
+        assert exporter.write([{'Temperature': 21.5}, {'Temperature': 20, 'CO2': 800}]) == 2
+    with open(path) as f:
+        assert list(csv.DictReader(f)) == [{'CO2': '', 'Temperature': '21.5'}, {'CO2': '800', 'Temperature': '20'}]
+
+
+def test_arrow_column_empty_in_first_chunk(netatmo, tmp_path):
+    pa = pytest.importorskip('pyarrow')
+    path = str(tmp_path / 'out.arrow')
+    rows = [{'module_id': 'a', 'Temperature': None}, {'module_id': 'b', 'Temperature': 21}, {'module_id': 'c', 'Temperature': 21.5}]
+    with netatmo.ArrowExporter(path, chunk_size=1) as exporter:
+        exporter.write(rows)
+    table = pa.ipc.open_file(path).read_all()
+    assert table.column('Temperature').to_pylist() == [None, 21.0, 21.5]
@@ -0,0 +1,70 @@
+import random
+import threading
+
+import pytest
+
+
+def station(id, lat, lon, temperature=20):
+    return {
+        '_id': id,
+        'place': {'location': [lon, lat]},
+        'measures': {
+            'outdoor': {'res': {'1000': [temperature - 1, 50], '2000': [temperature, 60]}, 'type': ['temperature', 'humidity']},
+            'rain': {'rain_60min': 1.5, 'rain_24h': 3}
+        }
+    }
+
+
+@pytest.fixture
+def weather(netatmo, offline_auth):
+    return netatmo.Weather()
+
+
+def test_tiles_are_fetched_and_merged(netatmo, weather, monkeypatch):
+    payloads = list()
+    lock = threading.Lock()
+
+    def api_call(resource, payload):
+        assert resource == '/api/getpublicdata'
+        with lock:
+            payloads.append(payload)
+        # The same station sits on the border between two tiles
+        stations = [station('border', 45.5, 9.0)]
+        stations.append(station('tile %s %s' % (payload['lat_sw'], payload['lon_sw']), payload['lat_sw'] + 0.1, payload['lon_sw'] + 0.1))
+        return {'body': stations}
+    monkeypatch.setattr(weather, '_api_call', api_call)
+    stations = weather.get_public_data(46, 10, 45, 8.5, required_data='temperature', tile_size=0.5)
+    assert sorted((p['lat_sw'], p['lon_sw'], p['lat_ne'], p['lon_ne']) for p in payloads) == [
+        (45, 8.5, 45.5, 9.0), (45, 9.0, 45.5, 9.5), (45, 9.5, 45.5, 10),
+        (45.5, 8.5, 46, 9.0), (45.5, 9.0, 46, 9.5), (45.5, 9.5, 46, 10)]
+    assert all(p['required_data'] == 'temperature' and p['filter'] == 'false' for p in payloads)
+    assert len(stations) == 7
+    assert len([s for s in stations if s['_id'] == 'border']) == 1
+
+
+def test_nearest_matches_brute_force(netatmo):
+    random.seed(0)
+    stations = [station(str(i), random.uniform(44, 46), random.uniform(8, 10)) for i in range(1000)]
+    index = netatmo.Weather.PublicStations(stations)
+    distance = netatmo.Weather.PublicStations._distance
+    for _ in range(200):
+        lat, lon, n = random.uniform(43.5, 46.5), random.uniform(7.5, 10.5), random.randint(1, 10)
+        expected = sorted(stations, key=lambda s: distance(lat, lon, s['place']['location'][1], s['place']['location'][0]))[:n]
+        assert [s['_id'] for s in index.nearest(lat, lon, n)] == [s['_id'] for s in expected]
+
+
+def test_nearest_with_few_stations(netatmo):
+    index = netatmo.Weather.PublicStations([station('a', 45, 9), station('b', 50, 9)])
+    assert [s['_id'] for s in index.nearest(45.1, 9, 5)] == ['a', 'b']
+    assert netatmo.Weather.PublicStations([]).nearest(45, 9) == []
+
+
+def test_within_and_mean(netatmo):
+    stations = [station('in1', 45.2, 9.2, 18), station('in2', 45.8, 9.1, 22), station('out', 45.8, 9.8, 30)]
+    index = netatmo.Weather.PublicStations(stations)
+    # Triangle with vertices in (45, 9), (46, 9) and (45, 10): 'out' is in its bounding box but not inside it
+    triangle = [(45, 9), (46, 9), (45, 10)]
+    assert sorted(s['_id'] for s in index.within(triangle)) == ['in1', 'in2']
+    assert index.mean('temperature', triangle) == 20
+    assert index.mean('rain_60min', triangle) == 1.5
+    assert index.mean('temperature', [(40, 0), (41, 0), (41, 1)]) is None
@@ -0,0 +1,108 @@
+import copy
+from time import time
+
+import pytest
+
+
+STATIONS = {
+    'body': {
+        'devices': [{
+            '_id': 'indoor',
+            'station_name': 'Home',
+            'module_name': 'Living',
+            'reachable': True,
+            'dashboard_data': {'CO2': 800, 'Temperature': 21},
+            'modules': [{
+                '_id': 'bedroom',
+                'module_name': 'Bedroom',
+                'reachable': True,
+                'battery_percent': 80,
+                'dashboard_data': {'CO2': 1200, 'Temperature': 19}
+            }]
+        }]
+    }
+}
+
+
+@pytest.fixture
+def differ(netatmo):
+    return netatmo.Differ()
+
+
+@pytest.fixture
+def engine(netatmo, differ):
+    engine = netatmo.RuleEngine()
+    differ.subscribe(engine.process)
+    return engine
+
+
+def alerts(result):
+    return sorted((a.rule.name, a.id, a.active) for a in result)
+
+
+def update(differ, engine, change=None):
+    snapshot = copy.deepcopy(STATIONS)
+    if change:
+        change(snapshot['body']['devices'][0])
+    received = list()
+    engine.subscribe(received.extend)
+    differ.update(snapshot)
+    engine.unsubscribe(received.extend)
+    return alerts(received)
+
+
+def test_any_id_and_per_id_rules(netatmo, differ, engine):
+    engine.add_rule('co2', 'CO2', '>', 1000)
+    engine.add_rule('living co2', 'CO2', '>', 700, id='indoor')
+    assert update(differ, engine) == [('co2', 'bedroom', True), ('living co2', 'indoor', True)]
+
+    def bedroom_warmer(device):
+        device['modules'][0]['dashboard_data']['Temperature'] = 20
+    # Only the rules watching the changed value are evaluated
+    assert update(differ, engine, bedroom_warmer) == []
+
+
+def test_alert_clears_when_value_goes_back(netatmo, differ, engine):
+    engine.add_rule('co2', 'CO2', '>', 1000)
+    update(differ, engine)
+
+    def ventilate(device):
+        device['modules'][0]['dashboard_data']['CO2'] = 600
+    assert update(differ, engine, ventilate) == [('co2', 'bedroom', False)]
+    assert engine.active_alerts == []
+
+
+def test_alert_clears_when_entity_is_removed(netatmo, differ, engine):
+    engine.add_rule('battery', 'battery_percent', '<', 90)
+    assert update(differ, engine) == [('battery', 'bedroom', True)]
+
+    def remove_bedroom(device):
+        device['modules'] = []
+    assert update(differ, engine, remove_bedroom) == [('battery', 'bedroom', False)]
+
+
+def test_duration_rule_waits_for_check(netatmo, differ, engine):
+    engine.add_rule('offline', 'reachable', '==', False, duration=600)
+    update(differ, engine)
+
+    def disconnect(device):
+        device['modules'][0]['reachable'] = False
+    assert update(differ, engine, disconnect) == []
+    assert engine.check(time() + 300) == []
+    assert alerts(engine.check(time() + 601)) == [('offline', 'bedroom', True)]
+    assert engine.check(time() + 1200) == []
+
+
+def test_remove_rule_drops_state(netatmo, differ, engine):
+    engine.add_rule('co2', 'CO2', '>', 1000)
+    engine.add_rule('offline', 'reachable', '==', False, duration=600)
+    update(differ, engine)
+
+    def disconnect(device):
+        device['modules'][0]['reachable'] = False
+    update(differ, engine, disconnect)
+    engine.remove_rule('co2')
+    engine.remove_rule('offline')
+    assert engine.rules == []
+    assert engine.active_alerts == []
+    assert engine.check(time() + 601) == []
@@ -0,0 +1,102 @@
+import pytest
+
+
+@pytest.fixture
+def security(netatmo, offline_auth, monkeypatch):
+    monkeypatch.setattr(netatmo.Security, '_get_home_info', lambda self: ('home', {}))
+    return netatmo.Security('Home')
+
+
+def camera(netatmo, server, **kwargs):
+    data = {'id': 'camera', 'vpn_url': 'http://%s:%d/vpn' % server.server_address, 'is_local': True}
+    data.update(kwargs)
+    return netatmo.Security.Camera(data)
+
+
+def test_local_snapshot(netatmo, security, camera_server):
+    c = camera(netatmo, camera_server)
+    assert security.get_camera_url(c) == ('http://%s:%d/local' % camera_server.server_address, True)
+    assert security.get_live_snapshot(c).size == (4, 4)
+    assert camera_server.snapshots == ['local']
+    assert security.get_camera_status(c)['is_local']
+
+
+def test_cloud_fallback(netatmo, security, camera_server):
+    c = camera(netatmo, camera_server)
+    security.get_camera_url(c)
+    camera_server.routes.discard('local')
+    assert security.get_live_snapshot(c).size == (4, 4)
+    assert camera_server.snapshots == ['vpn']
+    assert not security.get_camera_status(c)['is_local']
+
+
+def test_invalid_local_image_falls_back_to_cloud(netatmo, security, camera_server):
+    c = camera(netatmo, camera_server)
+    camera_server.broken.add('local')
+    assert security.get_live_snapshot(c).size == (4, 4)
+    assert camera_server.snapshots == ['vpn']
+
+
+def test_reconnected_camera_is_resolved_again(netatmo, security, camera_server):
+    c = camera(netatmo, camera_server, is_local=False)
+    assert security.get_camera_url(c) == (c.vpn_url, False)
+    c.vpn_url = 'http://%s:%d/vpn2' % camera_server.server_address
+    assert security.get_camera_url(c) == (c.vpn_url, False)
+    assert security.get_live_snapshot(c).size == (4, 4)
+    assert camera_server.snapshots == ['vpn2']
+
+
+def test_remote_camera_uses_cloud(netatmo, security, camera_server):
+    c = camera(netatmo, camera_server, is_local=False)
+    assert security.get_camera_url(c) == (c.vpn_url, False)
+
+
+def test_disconnected_camera(netatmo, security):
+    with pytest.raises(netatmo.APIError):
+        security.get_camera_url(netatmo.Security.Camera({'id': 'camera', 'status': 'disconnected'}))
+
+
+class FakeResponse(object):
+
+    def __init__(self, data):
+        self.data = data
+        self.text = str(data)
+        self.connection = self
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+    def close(self):
+        pass
+
+
+def test_api_calls_are_rate_limited(netatmo, security, monkeypatch):
+    calls = list()
+    monkeypatch.setattr(netatmo.Netatmo, '_wait_rate_limit', lambda self: calls.append('wait'))
+    monkeypatch.setattr(netatmo.requests, 'post', lambda url, **kwargs: calls.append(url) or FakeResponse({'body': {'homes': [{'name': 'Home', 'events': []}]}}))
+    security.get_home_data()
+    security.Dropwebhook()
+    assert calls == ['wait', 'https://api.netatmo.com/api/gethomedata', 'wait', 'https://api.netatmo.com/api/dropwebhook']
+
+
+def test_iter_events_pages_lazily(netatmo, security, monkeypatch):
+    history = [{'id': 'event%d' % i, 'time': 1000 - i, 'type': 'movement'} for i in range(10)]
+    requested = list()
+
+    def post(url, params):
+        requested.append(url.rsplit('/', 1)[1])
+        if url.endswith('gethomedata'):
+            return FakeResponse({'body': {'homes': [{'name': 'Home', 'events': history[:params['size']]}]}})
+        start = [e['id'] for e in history].index(params['event_id']) + 1
+        return FakeResponse({'body': {'events_list': history[start:start + params['size']]}})
+    monkeypatch.setattr(netatmo.requests, 'post', post)
+    events = security.iter_events(size=4)
+    assert [next(events).id for _ in range(4)] == ['event0', 'event1', 'event2', 'event3']
+    assert requested == ['gethomedata']
+    assert [e.id for e in events] == ['event%d' % i for i in range(4, 10)]
+    assert requested == ['gethomedata', 'getnextevents', 'getnextevents', 'getnextevents']
+    assert [e.id for e in security.iter_events(size=4, until=995)] == ['event%d' % i for i in range(6)]
+    assert len(security.event_store) == 0
@@ -0,0 +1,76 @@
+import pytest
+
+
+@pytest.fixture
+def clock(netatmo, monkeypatch):
+    now = [1000000.0]
+    monkeypatch.setattr(netatmo, 'time', lambda: now[0])
+    return now
+
+
+def stations_data(*modules):
+    device = dict(modules[0], station_name='Home', modules=list(modules[1:]))
+    return {'body': {'devices': [device]}}
+
+
+def module(id, time_utc, reachable=True):
+    return {'_id': id, 'reachable': reachable, 'dashboard_data': {'time_utc': time_utc} if time_utc else {}}
+
+
+def test_schedule_after_next_upload(netatmo, offline_auth, clock):
+    w = netatmo.Weather()
+    w._schedule_next_update(stations_data(module('a', clock[0] - 60)))
+    assert w.next_update == clock[0] + 570
+
+
+def test_polls_follow_uploads(netatmo, offline_auth, clock):
+    # The station uploads every 600 seconds, the first poll happens 100 seconds after an upload
+    w = netatmo.Weather()
+    start = clock[0]
+    clock[0] += 100
+    polls = list()
+    for _ in range(5):
+        last_upload = start + (clock[0] - start) // 600 * 600
+        w._schedule_next_update(stations_data(module('a', last_upload)))
+        polls.append(clock[0] - last_upload)
+        clock[0] = w.next_update
+    assert polls == [100, 30, 30, 30, 30]
+
+
+def test_offline_module_does_not_drive_polling(netatmo, offline_auth, clock):
+    w = netatmo.Weather()
+    w._schedule_next_update(stations_data(module('a', clock[0] - 300), module('b', None, reachable=False)))
+    assert w.next_update == clock[0] + 330
+
+
+def test_offline_backoff(netatmo, offline_auth, clock):
+    w = netatmo.Weather()
+    delays = list()
+    for _ in range(4):
+        w._schedule_next_update(stations_data(module('a', clock[0] - 5000, reachable=False)))
+        delays.append(w.next_update - clock[0])
+        clock[0] = w.next_update
+    assert delays == [600, 1200, 2400, 3600]
+
+
+def test_late_module_retries_shortly(netatmo, offline_auth, clock):
+    w = netatmo.Weather()
+    last_upload = clock[0] - 640
+    delays = list()
+    for _ in range(5):
+        w._schedule_next_update(stations_data(module('a', last_upload)))
+        delays.append(w.next_update - clock[0])
+        clock[0] = w.next_update
+    assert delays == [60, 120, 240, 480, 600]
+
+
+def test_close_uploads_are_grouped(netatmo, offline_auth, clock):
+    w = netatmo.Weather()
+    w._schedule_next_update(stations_data(module('a', clock[0] - 500), module('b', clock[0] - 470), module('c', clock[0] - 200)))
+    assert w.next_update == clock[0] + 160
+
+
+def test_guard_interval(netatmo, offline_auth, clock):
+    w = netatmo.Weather()
+    w._schedule_next_update(stations_data(*[module(str(i), clock[0] - 620 + i) for i in range(5)]))
+    assert w.next_update == clock[0] + 60